@@ -10,13 +10,67 @@ class Settings:
     SETMORE_SERVICE_KEY = os.getenv("SETMORE_SERVICE_KEY")
     SETMORE_BASE_URL = "https://developer.setmore.com/api/v1"
     
+    # Setmore retries / circuit breaker
+    SETMORE_MAX_RETRIES = int(os.getenv("SETMORE_MAX_RETRIES", 3))
+    SETMORE_BACKOFF_BASE_SECONDS = float(os.getenv("SETMORE_BACKOFF_BASE_SECONDS", 1))
+    SETMORE_BACKOFF_MAX_SECONDS = float(os.getenv("SETMORE_BACKOFF_MAX_SECONDS", 30))
+    SETMORE_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("SETMORE_CIRCUIT_FAILURE_THRESHOLD", 5))
+    SETMORE_CIRCUIT_RESET_SECONDS = int(os.getenv("SETMORE_CIRCUIT_RESET_SECONDS", 120))
+    
+    # Setmore rate governor (per process - divide across worker processes)
+    SETMORE_RATE_LIMIT_PER_SECOND = float(os.getenv("SETMORE_RATE_LIMIT_PER_SECOND", 5))
+    SETMORE_RATE_BURST = int(os.getenv("SETMORE_RATE_BURST", 10))
+    SETMORE_RATE_MIN_PER_SECOND = float(os.getenv("SETMORE_RATE_MIN_PER_SECOND", 0.5))
+    SETMORE_ADHOC_RESERVE = float(os.getenv("SETMORE_ADHOC_RESERVE", 0.3))  # share of burst kept for polls
+    SETMORE_RATE_DECREASE_FACTOR = float(os.getenv("SETMORE_RATE_DECREASE_FACTOR", 0.5))
+    SETMORE_RATE_INCREASE_STEP = float(os.getenv("SETMORE_RATE_INCREASE_STEP", 0.05))
+    
     # App config
     POLL_INTERVAL_MINUTES = int(os.getenv("POLL_INTERVAL_MINUTES", 60))
     DAYS_TO_POLL = int(os.getenv("DAYS_TO_POLL", 7))
+    REPOLL_FAILED_DATES_MINUTES = int(os.getenv("REPOLL_FAILED_DATES_MINUTES", 5))
+    # Graceful shutdown - time for in-flight polls/sends, then to persist leftovers
+    SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", 20))
+    SHUTDOWN_PERSIST_SECONDS = float(os.getenv("SHUTDOWN_PERSIST_SECONDS", 5))
+    SUBSCRIBER_CACHE_REFRESH_SECONDS = int(os.getenv("SUBSCRIBER_CACHE_REFRESH_SECONDS", 300))
+    
+    # Polling workers (python -m app.worker)
+    # Disable the in-process scheduler when standalone workers do the polling
+    ENABLE_IN_PROCESS_POLLER = os.getenv("ENABLE_IN_PROCESS_POLLER", "true").lower() == "true"
+    # Dates leased per worker cycle - keep it well below DAYS_TO_POLL or the
+    # first worker takes every date. Each batch sends its own digest, so
+    # smaller batches can split one cycle's news over several SMS.
+    WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", 2))
+    WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", 120))
+    WORKER_IDLE_SECONDS = int(os.getenv("WORKER_IDLE_SECONDS", 15))
+    
+    # notification_logs retention
+    NOTIFICATION_LOG_RETENTION_DAYS = int(os.getenv("NOTIFICATION_LOG_RETENTION_DAYS", 30))
+    NOTIFICATION_LOG_ARCHIVE_DIR = os.getenv("NOTIFICATION_LOG_ARCHIVE_DIR")  # unset = no archive
+    RETENTION_INTERVAL_HOURS = int(os.getenv("RETENTION_INTERVAL_HOURS", 24))
+    RETENTION_STARTUP_DELAY_MINUTES = int(os.getenv("RETENTION_STARTUP_DELAY_MINUTES", 5))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 500))
+    RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", 0.2))
+    RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", 1000))
+    
+    # Poll cycle tracing / profiling
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 50))
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 500))
+    PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 30))
     
     # Twilio
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+    TWILIO_TIMEOUT_SECONDS = float(os.getenv("TWILIO_TIMEOUT_SECONDS", 10))
+    TWILIO_POOL_SIZE = int(os.getenv("TWILIO_POOL_SIZE", 10))
+    SMS_MAX_SEGMENTS = int(os.getenv("SMS_MAX_SEGMENTS", 3))
+    
+    # Delivery priority - how much faster each day sooner drains (1 = no preference)
+    PRIORITY_DATE_WEIGHT = float(os.getenv("PRIORITY_DATE_WEIGHT", 4))
+    # Comma-separated phone numbers that go first within a date
+    PRIORITY_SUBSCRIBERS = {
+        p.strip() for p in os.getenv("PRIORITY_SUBSCRIBERS", "").split(",") if p.strip()
+    }
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
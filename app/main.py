@@ -1,14 +1,21 @@
-from fastapi import FastAPI, Depends
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 
+from app.config import settings
 from app.services.setmore_client import SetmoreClient
 from app.services.slot_tracker import SlotTracker
 from app.services.scheduler import scheduler
 from app.models.database import get_db
 from app.api.subscriptions import router as subscriptions_router 
 from app.services.notification_service import NotificationService
+from app.services.warm_start import preload
+from app.services.lifecycle import lifecycle
+from app.services.poll_jobs import PollJobService
+from app.services.rate_governor import setmore_governor
+from app.services.tracing import MAX_PROFILE_CYCLES, tracer
 
 
 @asynccontextmanager
@@ -18,13 +25,24 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     print("\n🚀 Starting OpenChair...")
-    scheduler.start()
+    await preload()
+    
+    scheduler.start(poll=settings.ENABLE_IN_PROCESS_POLLER)
+    if not settings.ENABLE_IN_PROCESS_POLLER:
+        print("ℹ️ In-process poller disabled - run `python -m app.worker` to poll")
     
     yield
     
-    # Shutdown
+    # Shutdown - stop taking work, then drain what's in flight
     print("\n👋 Shutting down OpenChair...")
+    lifecycle.begin_shutdown()
     scheduler.stop()
+    
+    timeout = settings.SHUTDOWN_DRAIN_SECONDS + settings.SHUTDOWN_PERSIST_SECONDS
+    if await asyncio.to_thread(lifecycle.wait_idle, timeout):
+        print("✅ In-flight polls and sends drained")
+    else:
+        print("⚠️ Shutdown timed out with work still in flight")
 
 
 app = FastAPI(
@@ -37,7 +55,7 @@ app = FastAPI(
 # Include routers
 app.include_router(subscriptions_router)  # NEW
 
-setmore = SetmoreClient()
+setmore = SetmoreClient(lane="adhoc")
 
 
 
@@ -63,17 +81,84 @@ async def health():
 
 
 @app.post("/admin/poll-now")
-async def trigger_poll():
+async def trigger_poll(db: Session = Depends(get_db)):
     """
     Admin endpoint - trigger a poll immediately (for testing)
+    
+    When standalone workers do the polling, this marks every poll job as
+    due instead of polling here, so it never races the workers' leases.
     """
     from app.services.polling_service import polling_service
-    await polling_service.poll_for_new_slots()  # Call async directly
+    
+    if not lifecycle.accepting_work:
+        raise HTTPException(status_code=503, detail="Shutting down")
+    
+    if not settings.ENABLE_IN_PROCESS_POLLER:
+        queued = PollJobService(db, worker_id="api").request_immediate_poll()
+        return {
+            "message": f"Queued {queued} dates for the polling workers",
+            "status": "check worker logs for results"
+        }
+    
+    # Admin-triggered, so it yields to scheduled polls like other ad-hoc calls
+    await polling_service.poll_for_new_slots(lane="adhoc")  # Call async directly
+    scheduler.schedule_repoll()
     return {
         "message": "Poll completed",
         "status": "check logs for results"
     }
 
+@app.get("/admin/setmore/rate-limit")
+async def setmore_rate_limit():
+    """
+    Admin endpoint - live Setmore request budget and wait times
+    """
+    return setmore_governor.stats()
+
+
+@app.get("/admin/traces")
+async def poll_traces(limit: int = 10, spans: bool = True):
+    """
+    Admin endpoint - per-phase timings of recent poll cycles (newest first)
+    
+    Traces are kept per process, so this only shows cycles run here - with
+    ENABLE_IN_PROCESS_POLLER=false they live in the worker processes.
+    
+    Example: /admin/traces?limit=5&spans=false
+    """
+    return {
+        "profile_cycles_pending": tracer.profile_remaining,
+        "traces": tracer.recent(limit, include_spans=spans)
+    }
+
+
+@app.post("/admin/profile")
+async def profile_polls(cycles: int = 1):
+    """
+    Admin endpoint - cProfile the next N poll cycles
+    
+    Results show up under "profile" in /admin/traces.
+    """
+    if not settings.ENABLE_IN_PROCESS_POLLER:
+        raise HTTPException(
+            status_code=409,
+            detail="Polling runs in the worker processes (ENABLE_IN_PROCESS_POLLER=false) "
+                   "- no poll cycle runs in the API process to profile"
+        )
+    
+    if not 1 <= cycles <= MAX_PROFILE_CYCLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"cycles must be between 1 and {MAX_PROFILE_CYCLES}"
+        )
+    
+    tracer.request_profile(cycles)
+    return {
+        "message": f"Profiling the next {cycles} poll cycles",
+        "profile_cycles_pending": tracer.profile_remaining
+    }
+
+
 @app.post("/admin/test-sms")
 async def test_sms(
     phone_number: str,
@@ -99,6 +184,31 @@ async def test_sms(
         }
 
 
+@app.get("/admin/events/{event_id}/recipients")
+async def event_recipients(
+    event_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Admin endpoint - who was sent a notification event
+    """
+    notifier = NotificationService(db)
+    recipients = notifier.get_event_recipients(event_id)
+    
+    return {
+        "event_id": event_id,
+        "count": len(recipients),
+        "recipients": [
+            {
+                "phone_number": r.phone_number,
+                "status": r.status,
+                "provider_sid": r.provider_sid,
+                "sent_at": r.sent_at.isoformat()
+            }
+            for r in recipients
+        ]
+    }
+
 
 @app.get("/test/slots")
 async def test_slots():
@@ -1,13 +1,19 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# SQLite database file
-SQLALCHEMY_DATABASE_URL = "sqlite:///./openchair.db"
+# SQLite database file by default - point DATABASE_URL at a shared database
+# when running polling workers on more than one machine
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./openchair.db")
+
+connect_args = {}
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    connect_args["check_same_thread"] = False  # Needed for SQLite
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args=connect_args
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
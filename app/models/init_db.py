@@ -1,9 +1,19 @@
 from app.models.database import engine, Base
-from app.models.models import SlotSnapshot, Subscription, NotificationLog
+from app.models.models import (
+    SlotSnapshot, Subscription, NotificationLog, NotificationEvent, NotificationRecipient,
+    Delivery, PendingDelivery, NotificationDailyStat, PollJob, AppState
+)
 
 def init_database():
     """Create all tables"""
     print("Creating database tables...")
+    
+    # Lets the retention job reclaim space with incremental vacuum
+    # (only takes effect on a new SQLite database or after a full VACUUM)
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    
     Base.metadata.create_all(bind=engine)
     print("✅ Database initialized!")
 
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, DateTime, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Text, Boolean, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from app.models.database import Base
+import hashlib
 import json
 
 class SlotSnapshot(Base):
@@ -30,7 +31,12 @@ class Subscription(Base):
     
 
 class NotificationLog(Base):
-    """Log of all notifications sent (for debugging/auditing)"""
+    """
+    Legacy per-recipient notification log
+    
+    No longer written - see NotificationEvent / NotificationRecipient.
+    Old rows are compacted away by the retention job.
+    """
     __tablename__ = "notification_logs"
     
     id = Column(String, primary_key=True)  # We'll generate UUID
@@ -43,4 +49,92 @@ class NotificationLog(Base):
         return json.loads(self.slots)
     
     def set_slots_list(self, slots_list):
-        self.slots = json.dumps(slots_list)
\ No newline at end of file
+        self.slots = json.dumps(slots_list)
+
+
+class NotificationEvent(Base):
+    """A set of new slots for one date, stored once however many people were told"""
+    __tablename__ = "notification_events"
+    __table_args__ = (UniqueConstraint("date", "slots_key"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    date = Column(String, nullable=False)  # "2026-01-20"
+    slots = Column(Text, nullable=False)  # JSON array: ["1:00 PM", "2:20 PM"]
+    slots_key = Column(String, nullable=False)  # hash of the sorted slots
+    created_at = Column(DateTime, default=func.now())
+    
+    @staticmethod
+    def make_slots_key(slots_list):
+        """Order-independent key for a slot set"""
+        return hashlib.sha1(json.dumps(sorted(slots_list)).encode()).hexdigest()
+    
+    def get_slots_list(self):
+        return json.loads(self.slots)
+    
+    def set_slots_list(self, slots_list):
+        self.slots = json.dumps(slots_list)
+        self.slots_key = self.make_slots_key(slots_list)
+
+
+class NotificationRecipient(Base):
+    """One subscriber's delivery of a NotificationEvent"""
+    __tablename__ = "notification_recipients"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(Integer, ForeignKey("notification_events.id"), nullable=False, index=True)
+    phone_number = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False)  # "sent" / "failed"
+    provider_sid = Column(String, nullable=True)  # Twilio message SID
+    sent_at = Column(DateTime, default=func.now(), index=True)
+
+
+class Delivery(Base):
+    """One slot delivered to one subscriber - the primary key makes sends idempotent"""
+    __tablename__ = "deliveries"
+    
+    phone_number = Column(String, primary_key=True)
+    date = Column(String, primary_key=True, index=True)  # "2026-01-20"
+    slot = Column(String, primary_key=True)  # "1:00 PM"
+    sent_at = Column(DateTime, default=func.now())
+
+
+class PendingDelivery(Base):
+    """A slot whose send was cut off by shutdown - sent by the next instance"""
+    __tablename__ = "pending_deliveries"
+    
+    phone_number = Column(String, primary_key=True)
+    date = Column(String, primary_key=True)  # "2026-01-20"
+    slot = Column(String, primary_key=True)  # "1:00 PM"
+    queued_at = Column(DateTime, default=func.now())
+
+
+class NotificationDailyStat(Base):
+    """Compact daily roll-up of notification_logs rows removed by retention"""
+    __tablename__ = "notification_daily_stats"
+    
+    sent_day = Column(String, primary_key=True)  # "2026-01-18" - day the SMS went out
+    date = Column(String, primary_key=True)  # "2026-01-20" - slot date it was about
+    notification_count = Column(Integer, default=0, nullable=False)
+    slot_count = Column(Integer, default=0, nullable=False)
+
+
+class PollJob(Base):
+    """A (target, date) poll job, leased by polling workers"""
+    __tablename__ = "poll_jobs"
+    
+    target = Column(String, primary_key=True)  # "<staff_key>:<service_key>"
+    date = Column(String, primary_key=True)  # "2026-01-20"
+    next_run_at = Column(DateTime, nullable=False, default=func.now(), index=True)
+    lease_owner = Column(String, nullable=True)  # "<hostname>:<pid>"
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_polled = Column(DateTime, nullable=True)
+    failures = Column(Integer, default=0)
+
+
+class AppState(Base):
+    """Small key/value store for state that must survive restarts"""
+    __tablename__ = "app_state"
+    
+    key = Column(String, primary_key=True)  # "last_poll_at"
+    value = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
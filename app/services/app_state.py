@@ -0,0 +1,46 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from app.models.models import AppState
+
+
+LAST_POLL_AT = "last_poll_at"
+LAST_RETENTION_AT = "last_retention_at"
+
+
+class AppStateService:
+    """Reads and writes persisted app state (survives restarts and deploys)"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get(self, key: str) -> Optional[str]:
+        state = self.db.query(AppState).filter(AppState.key == key).first()
+        return state.value if state else None
+    
+    def set(self, key: str, value: Optional[str]):
+        state = self.db.query(AppState).filter(AppState.key == key).first()
+        
+        if state:
+            state.value = value
+        else:
+            self.db.add(AppState(key=key, value=value))
+        
+        self.db.commit()
+    
+    def get_last_poll_at(self) -> Optional[datetime]:
+        """When the last full poll finished, or None if never"""
+        value = self.get(LAST_POLL_AT)
+        return datetime.fromisoformat(value) if value else None
+    
+    def set_last_poll_at(self, when: datetime):
+        self.set(LAST_POLL_AT, when.isoformat())
+    
+    def get_last_retention_at(self) -> Optional[datetime]:
+        """When the notification log retention job last finished, or None if never"""
+        value = self.get(LAST_RETENTION_AT)
+        return datetime.fromisoformat(value) if value else None
+    
+    def set_last_retention_at(self, when: datetime):
+        self.set(LAST_RETENTION_AT, when.isoformat())
@@ -0,0 +1,61 @@
+import heapq
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.config import settings
+
+
+class DeliveryQueue:
+    """
+    Priority queue for outgoing notifications
+    
+    Messages are grouped by the date they're about. Each date drains at a
+    rate weighted by how soon it is - with PRIORITY_DATE_WEIGHT = 4, today's
+    messages go out four times as fast as tomorrow's, sixteen times as fast
+    as the day after, and so on. Urgent slots reach phones first, but later
+    dates are interleaved rather than starved. Within a date, lower tiers
+    (priority subscribers) go first.
+    """
+    
+    def __init__(self, today: datetime = None):
+        self.today = (today or datetime.now()).date()
+        self._heap: List[Tuple[float, int, str, int, Any]] = []
+        self._pending: Dict[str, List[Tuple[int, int, Any]]] = {}
+        self._seq = 0
+    
+    def push(self, date: str, item: Any, tier: int = 1):
+        """
+        Queue an item about a date
+        
+        Args:
+            date: Date string like "2026-01-20" - the soonest date the message covers
+            item: Whatever the sender needs (phone number, message, ...)
+            tier: 0 for priority subscribers, 1 for everyone else
+        """
+        self._pending.setdefault(date, []).append((tier, self._seq, item))
+        self._seq += 1
+    
+    def __len__(self):
+        return len(self._heap) + sum(len(items) for items in self._pending.values())
+    
+    def __iter__(self) -> Iterator[Any]:
+        """Pop items in delivery order"""
+        self._schedule()
+        while self._heap:
+            yield heapq.heappop(self._heap)[-1]
+    
+    def _schedule(self):
+        """Give every pending item a virtual send time and move it onto the heap"""
+        for date, items in self._pending.items():
+            days_ahead = max(0, (datetime.strptime(date, "%Y-%m-%d").date() - self.today).days)
+            spacing = settings.PRIORITY_DATE_WEIGHT ** days_ahead
+            
+            for position, (tier, seq, item) in enumerate(sorted(items, key=lambda i: i[:2])):
+                heapq.heappush(self._heap, ((position + 1) * spacing, tier, date, seq, item))
+        
+        self._pending = {}
+
+
+def subscriber_tier(phone_number: str) -> int:
+    """0 for numbers listed in PRIORITY_SUBSCRIBERS, 1 for everyone else"""
+    return 0 if phone_number in settings.PRIORITY_SUBSCRIBERS else 1
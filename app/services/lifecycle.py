@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.config import settings
+
+
+class Lifecycle:
+    """
+    Coordinates graceful shutdown across polls and SMS fan-outs
+    
+    Once shutdown begins, no new polls start and in-flight work has
+    SHUTDOWN_DRAIN_SECONDS to finish. Past that deadline, sends stop and
+    whatever is still queued is persisted for the next instance.
+    """
+    
+    def __init__(self):
+        self._draining = False
+        self._deadline: Optional[float] = None
+        self._in_flight = 0
+        self._idle = threading.Condition()
+    
+    @property
+    def accepting_work(self) -> bool:
+        return not self._draining
+    
+    def begin_shutdown(self, drain_seconds: Optional[float] = None):
+        """Stop taking new work and start the drain deadline"""
+        if self._draining:
+            return
+        
+        if drain_seconds is None:
+            drain_seconds = settings.SHUTDOWN_DRAIN_SECONDS
+        
+        self._deadline = time.monotonic() + drain_seconds
+        self._draining = True
+        print(f"⏳ Draining in-flight work (up to {drain_seconds:.0f}s)")
+    
+    def should_stop_sending(self) -> bool:
+        """True once the drain deadline has passed"""
+        return self._draining and time.monotonic() >= self._deadline
+    
+    @contextmanager
+    def track(self):
+        """Mark a unit of work (a poll, a fan-out) as in flight"""
+        with self._idle:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+    
+    def wait_idle(self, timeout: float) -> bool:
+        """
+        Block until no work is in flight
+        
+        Returns:
+            True if everything finished within the timeout
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+
+# Global instance
+lifecycle = Lifecycle()
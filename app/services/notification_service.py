@@ -1,29 +1,93 @@
-from twilio.rest import Client
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import List
-import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import threading
 
 from app.config import settings
-from app.models.models import NotificationLog, Subscription
+from app.services.delivery_queue import DeliveryQueue, subscriber_tier
+from app.services.lifecycle import lifecycle
+from app.services.tracing import tracer
+from app.services.subscriber_cache import active_subscribers
+from app.models.models import Delivery, NotificationEvent, NotificationRecipient, PendingDelivery
 
 
-class NotificationService:
-    """Handles SMS notifications via Twilio"""
+# GSM 03.38 basic character set - anything outside it forces UCS-2 encoding
+GSM7_CHARS = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+
+def sms_segment_count(text: str) -> int:
+    """Number of SMS segments a message will be billed as"""
+    if set(text) <= GSM7_CHARS:
+        length, single, multi = len(text), 160, 153
+    else:
+        # UCS-2 counts UTF-16 code units (emoji take two)
+        length, single, multi = len(text.encode("utf-16-le")) // 2, 70, 67
     
-    def __init__(self, db: Session):
-        self.db = db
+    if length <= single:
+        return 1
+    return -(-length // multi)
+
+
+_twilio_client = None
+_twilio_client_lock = threading.Lock()
+_twilio_checked = False
+
+
+def get_twilio_client():
+    """
+    Get the process-wide Twilio client, creating it on first use
+    
+    The client keeps a pooled HTTP session so every send reuses a warm
+    connection. Twilio itself is only imported the first time this runs.
+    
+    Returns:
+        twilio.rest.Client, or None if Twilio isn't configured
+    """
+    global _twilio_client, _twilio_checked
+    
+    if _twilio_checked:
+        return _twilio_client
+    
+    with _twilio_client_lock:
+        if _twilio_checked:
+            return _twilio_client
         
-        # Initialize Twilio client
         if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
-            self.client = Client(
+            from requests.adapters import HTTPAdapter
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client
+            
+            http_client = TwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_TIMEOUT_SECONDS)
+            http_client.session.mount(
+                "https://",
+                HTTPAdapter(pool_connections=1, pool_maxsize=settings.TWILIO_POOL_SIZE)
+            )
+            
+            _twilio_client = Client(
                 settings.TWILIO_ACCOUNT_SID,
-                settings.TWILIO_AUTH_TOKEN
+                settings.TWILIO_AUTH_TOKEN,
+                http_client=http_client
             )
-            self.from_number = settings.TWILIO_PHONE_NUMBER
         else:
-            self.client = None
             print("⚠️ Twilio not configured - notifications disabled")
+        
+        _twilio_checked = True
+        return _twilio_client
+
+
+class NotificationService:
+    """Handles SMS notifications via Twilio"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+        
+        # Shared Twilio client (None if not configured)
+        self.client = get_twilio_client()
+        self.from_number = settings.TWILIO_PHONE_NUMBER
     
     def send_sms(self, to_number: str, message: str) -> bool:
         """
@@ -36,23 +100,33 @@ class NotificationService:
         Returns:
             True if sent successfully, False otherwise
         """
+        return self._send(to_number, message) is not None
+    
+    def _send(self, to_number: str, message: str) -> Optional[str]:
+        """
+        Send SMS to a phone number
+        
+        Returns:
+            Twilio message SID, or None if the send failed
+        """
         if not self.client:
             print(f"⚠️ Twilio not configured - would send to {to_number}: {message}")
-            return False
+            return None
         
         try:
-            message_obj = self.client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=to_number
-            )
+            with tracer.span("twilio"):
+                message_obj = self.client.messages.create(
+                    body=message,
+                    from_=self.from_number,
+                    to=to_number
+                )
             
             print(f"✅ SMS sent to {to_number} (SID: {message_obj.sid})")
-            return True
+            return message_obj.sid
             
         except Exception as e:
             print(f"❌ Failed to send SMS to {to_number}: {e}")
-            return False
+            return None
     
     def notify_new_slots(self, date: str, new_slots: List[str]) -> int:
         """
@@ -63,33 +137,279 @@ class NotificationService:
             new_slots: List of new slot times like ["1:00 PM", "2:20 PM"]
             
         Returns:
-            Number of notifications sent
+            Number of subscribers notified
         """
-        # Get all active subscribers
-        subscribers = self.db.query(Subscription).filter(
-            Subscription.is_active == True
-        ).all()
+        return self.notify_digest({date: new_slots})
+    
+    def notify_digest(
+        self,
+        new_slots_by_date: Dict[str, List[str]],
+        subscribers: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Send each active subscriber one digest covering every date with new slots
+        
+        The digest is ordered by date and only split into several messages
+        when it would exceed SMS_MAX_SEGMENTS. Messages go out through a
+        DeliveryQueue so the soonest slots reach phones first. Slots a
+        subscriber has already been sent (per the deliveries table) are left
+        out, so re-runs and overlapping polls never send the same slot twice.
+        
+        Args:
+            new_slots_by_date: {"2026-01-20": ["1:00 PM", "2:20 PM"], ...}
+            subscribers: Phone numbers to notify - defaults to a fresh
+                snapshot of the active subscriber set
+            
+        Returns:
+            Number of subscribers notified
+        """
+        new_slots_by_date = {d: s for d, s in new_slots_by_date.items() if s}
+        if not new_slots_by_date:
+            return 0
+        
+        if subscribers is None:
+            subscribers = active_subscribers.snapshot(self.db)
         
         if not subscribers:
             print("ℹ️ No active subscribers to notify")
             return 0
         
-        # Format the message
-        slots_text = ", ".join(new_slots)
-        message = self._format_message(date, new_slots)
+        # Everything already delivered for these dates, loaded once per cycle
+        with tracer.span("db", "load_deliveries"):
+            delivered = self._load_deliveries(new_slots_by_date.keys())
         
-        sent_count = 0
+        plan = {}
+        skipped_count = 0
         
-        for subscriber in subscribers:
-            # Send SMS
-            success = self.send_sms(subscriber.phone_number, message)
+        for phone_number in sorted(subscribers):
+            pending = {}
+            for date, slots in new_slots_by_date.items():
+                remaining = [s for s in slots if (phone_number, date, s) not in delivered]
+                if remaining:
+                    pending[date] = remaining
             
-            if success:
-                # Log the notification
-                self._log_notification(subscriber.phone_number, date, new_slots)
-                sent_count += 1
+            if pending:
+                plan[phone_number] = pending
+            else:
+                skipped_count += 1
         
-        return sent_count
+        if skipped_count:
+            print(f"♻️ Skipped {skipped_count} subscribers already notified about these slots")
+        
+        return self._deliver(plan)
+    
+    def resume_pending(self, subscribers: Optional[Iterable[str]] = None) -> int:
+        """
+        Send messages a previous instance persisted when it shut down mid fan-out
+        
+        Args:
+            subscribers: Phone numbers still subscribed - defaults to a fresh
+                snapshot of the active subscriber set
+        
+        Returns:
+            Number of subscribers notified
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        
+        rows = self.db.query(PendingDelivery).all()
+        if not rows:
+            return 0
+        
+        if subscribers is None:
+            subscribers = active_subscribers.snapshot(self.db)
+        subscribers = set(subscribers)
+        
+        plan = {}
+        stale = 0
+        for row in rows:
+            if row.date >= today and row.phone_number in subscribers:
+                plan.setdefault(row.phone_number, {}).setdefault(row.date, []).append(row.slot)
+            else:
+                # Unsubscribed since, or the date has passed - nothing to send
+                self.db.delete(row)
+                stale += 1
+        
+        if stale:
+            self.db.commit()
+        
+        print(f"▶️ Resuming {len(rows) - stale} pending deliveries for {len(plan)} subscribers")
+        return self._deliver(plan, resuming=True)
+    
+    def _deliver(self, plan: Dict[str, Dict[str, List[str]]], resuming: bool = False) -> int:
+        """
+        Format, prioritise, then claim and send one message at a time
+        
+        Args:
+            plan: {phone_number: {date: [slots]}} still to be sent
+            resuming: Plan came from PendingDelivery - drop each message's rows
+                once it is sent or another instance holds its claim
+            
+        Returns:
+            Number of subscribers notified
+        """
+        # Most subscribers need the same digest - format each variant once
+        parts_cache = {}
+        
+        # NotificationEvent id per (date, slot set), shared by every recipient
+        events = {}
+        
+        queue = DeliveryQueue()
+        for phone_number in sorted(plan):
+            key = tuple((date, tuple(slots)) for date, slots in sorted(plan[phone_number].items()))
+            if key not in parts_cache:
+                parts_cache[key] = self._format_digest(plan[phone_number])
+            
+            tier = subscriber_tier(phone_number)
+            for message, slots_by_date in parts_cache[key]:
+                queue.push(min(slots_by_date), (phone_number, message, slots_by_date), tier)
+        
+        with lifecycle.track():
+            # Send soonest slots first, interleaving later dates
+            notified = set()
+            items = iter(queue)
+            
+            for phone_number, message, slots_by_date in items:
+                if lifecycle.should_stop_sending():
+                    # Out of drain time - hand the rest to the next instance
+                    leftover = [(phone_number, slots_by_date)]
+                    leftover += [(phone, slots) for phone, _, slots in items]
+                    self._defer_deliveries(leftover)
+                    break
+                
+                # Reserve just before sending - catches concurrent workers, and a
+                # crash leaves at most this one message claimed but unsent
+                try:
+                    with tracer.span("db", "claim"):
+                        claimed = self._claim_deliveries(phone_number, slots_by_date)
+                except Exception as e:
+                    # e.g. "database is locked" - skip this message, not the fan-out
+                    self.db.rollback()
+                    print(f"❌ Failed to claim deliveries for {phone_number}: {e}")
+                    continue
+                
+                if not claimed:
+                    if resuming:
+                        self._forget_pending(phone_number, slots_by_date)
+                    continue
+                
+                if claimed == slots_by_date:
+                    parts = [(message, slots_by_date)]
+                else:
+                    parts = self._format_digest(claimed)
+                
+                for part, part_slots in parts:
+                    sid = self._send(phone_number, part)
+                    if sid:
+                        notified.add(phone_number)
+                    self._record_result(phone_number, part_slots, sid, events)
+                
+                if resuming:
+                    self._forget_pending(phone_number, slots_by_date)
+        
+        return len(notified)
+    
+    def _record_result(
+        self, phone_number: str, slots_by_date: Dict[str, List[str]],
+        sid: Optional[str], events: Dict[Tuple[str, str], int]
+    ):
+        """Log one send and free its claim if it failed - never raises"""
+        try:
+            with tracer.span("db", "log_recipient"):
+                self._log_recipient(phone_number, slots_by_date, sid, events)
+        except Exception as e:
+            self.db.rollback()
+            print(f"❌ Failed to log notification to {phone_number}: {e}")
+        
+        if sid:
+            return
+        
+        # Free the reservation so a later poll can retry
+        try:
+            with tracer.span("db", "release"):
+                self._release_deliveries(phone_number, slots_by_date)
+        except Exception as e:
+            self.db.rollback()
+            print(f"❌ Failed to release deliveries for {phone_number}: {e}")
+    
+    def _forget_pending(self, phone_number: str, slots_by_date: Dict[str, List[str]]):
+        """Drop persisted rows for a message that no longer needs resuming - never raises"""
+        try:
+            for date, slots in slots_by_date.items():
+                self.db.query(PendingDelivery).filter(
+                    PendingDelivery.phone_number == phone_number,
+                    PendingDelivery.date == date,
+                    PendingDelivery.slot.in_(slots)
+                ).delete(synchronize_session=False)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            print(f"❌ Failed to clear pending deliveries for {phone_number}: {e}")
+    
+    def _defer_deliveries(self, leftover: List[Tuple[str, Dict[str, List[str]]]]):
+        """Persist unsent messages so the next instance sends these"""
+        now = datetime.now()
+        
+        for phone_number, slots_by_date in leftover:
+            for date, slots in slots_by_date.items():
+                for slot in slots:
+                    self.db.merge(PendingDelivery(
+                        phone_number=phone_number, date=date, slot=slot, queued_at=now
+                    ))
+        self.db.commit()
+        
+        print(f"💾 Shutdown deadline hit - persisted {len(leftover)} unsent messages")
+    
+    def _load_deliveries(self, dates: Iterable[str]) -> Set[Tuple[str, str, str]]:
+        """Get (phone_number, date, slot) for everything already delivered on these dates"""
+        rows = self.db.query(Delivery.phone_number, Delivery.date, Delivery.slot).filter(
+            Delivery.date.in_(list(dates))
+        ).all()
+        return {tuple(row) for row in rows}
+    
+    def _claim_deliveries(
+        self, phone_number: str, slots_by_date: Dict[str, List[str]]
+    ) -> Dict[str, List[str]]:
+        """
+        Insert delivery rows for the given slots
+        
+        Returns:
+            The slots actually claimed - any another process already holds
+            are rejected by the primary key and left out
+        """
+        now = datetime.now()
+        rows = [(date, slot) for date, slots in slots_by_date.items() for slot in slots]
+        
+        try:
+            self.db.add_all([
+                Delivery(phone_number=phone_number, date=date, slot=slot, sent_at=now)
+                for date, slot in rows
+            ])
+            self.db.commit()
+            return slots_by_date
+        except IntegrityError:
+            self.db.rollback()
+        
+        # Someone beat us to part of it - claim row by row
+        claimed = {}
+        for date, slot in rows:
+            try:
+                self.db.add(Delivery(phone_number=phone_number, date=date, slot=slot, sent_at=now))
+                self.db.commit()
+                claimed.setdefault(date, []).append(slot)
+            except IntegrityError:
+                self.db.rollback()
+        
+        return claimed
+    
+    def _release_deliveries(self, phone_number: str, slots_by_date: Dict[str, List[str]]):
+        """Remove delivery rows for slots that failed to send"""
+        for date, slots in slots_by_date.items():
+            self.db.query(Delivery).filter(
+                Delivery.phone_number == phone_number,
+                Delivery.date == date,
+                Delivery.slot.in_(slots)
+            ).delete(synchronize_session=False)
+        self.db.commit()
     
     def _format_message(self, date: str, slots: List[str]) -> str:
         """
@@ -113,19 +433,133 @@ class NotificationService:
             slots_text = ", ".join(slots)
             return f"🪑 OpenChair: {len(slots)} new slots on {date_formatted}: {slots_text}"
     
-    def _log_notification(self, phone_number: str, date: str, slots: List[str]):
-        """Log notification in database"""
-        log = NotificationLog(
-            id=str(uuid.uuid4()),
-            phone_number=phone_number,
-            date=date,
-            sent_at=datetime.now()
-        )
-        log.set_slots_list(slots)
-        
-        self.db.add(log)
+    def _format_digest(
+        self, new_slots_by_date: Dict[str, List[str]]
+    ) -> List[Tuple[str, Dict[str, List[str]]]]:
+        """
+        Format a multi-date digest, split to fit SMS_MAX_SEGMENTS
+        
+        Args:
+            new_slots_by_date: Dict mapping date strings to new slots
+            
+        Returns:
+            List of (message, {date: slots covered by that message})
+        """
+        dates = sorted(new_slots_by_date)
+        
+        # A single date reads better in the original one-line format
+        if len(dates) == 1:
+            date = dates[0]
+            message = self._format_message(date, new_slots_by_date[date])
+            if sms_segment_count(message) <= settings.SMS_MAX_SEGMENTS:
+                return [(message, {date: new_slots_by_date[date]})]
+        
+        header = "🪑 OpenChair: New slots opened up!"
+        cont_header = "🪑 OpenChair (cont.):"
+        
+        parts = []
+        lines, covered = [header], {}
+        
+        def flush():
+            nonlocal lines, covered
+            if covered:
+                parts.append(("\n".join(lines), covered))
+            lines, covered = [cont_header], {}
+        
+        for date in dates:
+            date_formatted = datetime.strptime(date, "%Y-%m-%d").strftime("%a, %b %d")
+            
+            for slot in new_slots_by_date[date]:
+                # Extend this date's line if it's already the last one, else start it
+                if date in covered and lines[-1].startswith(f"{date_formatted}: "):
+                    candidate = lines[:-1] + [f"{lines[-1]}, {slot}"]
+                else:
+                    candidate = lines + [f"{date_formatted}: {slot}"]
+                
+                if covered and sms_segment_count("\n".join(candidate)) > settings.SMS_MAX_SEGMENTS:
+                    flush()
+                    candidate = lines + [f"{date_formatted}: {slot}"]
+                
+                lines = candidate
+                covered.setdefault(date, []).append(slot)
+        
+        flush()
+        return parts
+    
+    def _get_event_id(self, date: str, slots: List[str], events: Dict[Tuple[str, str], int]) -> int:
+        """
+        Get or create the NotificationEvent for a date and slot set
+        
+        Commits on its own, so call it before adding any other rows to the
+        session - a rollback here would discard them.
+        
+        Returns:
+            The event id (cached as a plain int - ORM objects expire on commit)
+        """
+        key = (date, NotificationEvent.make_slots_key(slots))
+        if key in events:
+            return events[key]
+        
+        event = self.db.query(NotificationEvent).filter(
+            NotificationEvent.date == date,
+            NotificationEvent.slots_key == key[1]
+        ).first()
+        
+        if not event:
+            event = NotificationEvent(date=date, created_at=datetime.now())
+            event.set_slots_list(slots)
+            self.db.add(event)
+            try:
+                self.db.commit()
+            except IntegrityError:
+                # Created concurrently by another worker
+                self.db.rollback()
+                event = self.db.query(NotificationEvent).filter(
+                    NotificationEvent.date == date,
+                    NotificationEvent.slots_key == key[1]
+                ).one()
+        
+        events[key] = event.id
+        return event.id
+    
+    def _log_recipient(
+        self,
+        phone_number: str,
+        slots_by_date: Dict[str, List[str]],
+        sid: Optional[str],
+        events: Dict[Tuple[str, str], int]
+    ):
+        """Log one message's outcome in database - one light row per event covered"""
+        now = datetime.now()
+        
+        # Resolve every event first so no recipient row is pending if one rolls back
+        event_ids = [self._get_event_id(date, slots, events) for date, slots in slots_by_date.items()]
+        
+        for event_id in event_ids:
+            self.db.add(NotificationRecipient(
+                event_id=event_id,
+                phone_number=phone_number,
+                status="sent" if sid else "failed",
+                provider_sid=sid,
+                sent_at=now
+            ))
+        
         self.db.commit()
     
+    def get_event_recipients(self, event_id: int) -> List[NotificationRecipient]:
+        """
+        Get everyone a notification event was sent to
+        
+        Args:
+            event_id: NotificationEvent id
+            
+        Returns:
+            List of NotificationRecipient rows (indexed lookup on event_id)
+        """
+        return self.db.query(NotificationRecipient).filter(
+            NotificationRecipient.event_id == event_id
+        ).order_by(NotificationRecipient.sent_at).all()
+    
     def send_test_notification(self, phone_number: str) -> bool:
         """
         Send a test notification
@@ -0,0 +1,171 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from app.config import settings
+from app.models.models import PollJob
+
+
+def default_target() -> str:
+    """Poll target for the configured Setmore staff/service"""
+    return f"{settings.SETMORE_STAFF_KEY}:{settings.SETMORE_SERVICE_KEY}"
+
+
+class PollJobService:
+    """Manages the shared table of (target, date) poll jobs and their leases"""
+    
+    def __init__(self, db: Session, worker_id: str, target: str = None):
+        self.db = db
+        self.worker_id = worker_id
+        self.target = target or default_target()
+    
+    def sync_jobs(self):
+        """
+        Make sure a job exists for each of the next DAYS_TO_POLL dates
+        and drop jobs for dates in the past
+        
+        Safe to run from every worker concurrently.
+        """
+        today = datetime.now()
+        wanted = {
+            (today + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range(settings.DAYS_TO_POLL)
+        }
+        
+        existing = {
+            row.date for row in self.db.query(PollJob.date).filter(PollJob.target == self.target)
+        }
+        
+        for date in sorted(wanted - existing):
+            try:
+                self.db.add(PollJob(target=self.target, date=date, next_run_at=today, failures=0))
+                self.db.commit()
+            except IntegrityError:
+                # Another worker created it first
+                self.db.rollback()
+        
+        deleted = self.db.query(PollJob).filter(
+            PollJob.target == self.target,
+            PollJob.date < today.strftime("%Y-%m-%d")
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        
+        if deleted > 0:
+            print(f"🧹 Removed {deleted} past poll jobs")
+    
+    def lease_due_jobs(self, limit: int) -> List[PollJob]:
+        """
+        Lease up to `limit` due jobs that nobody holds (or whose lease expired)
+        
+        Each lease is taken with a conditional UPDATE, so two workers can
+        never hold the same job at once.
+        
+        Returns:
+            The leased jobs, soonest date first
+        """
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=settings.WORKER_LEASE_SECONDS)
+        
+        unleased = or_(PollJob.lease_owner.is_(None), PollJob.lease_expires_at < now)
+        
+        candidates = self.db.query(PollJob.date).filter(
+            PollJob.target == self.target,
+            PollJob.next_run_at <= now,
+            unleased
+        ).order_by(PollJob.date).limit(limit).all()
+        
+        leased_dates = []
+        for (date,) in candidates:
+            updated = self.db.query(PollJob).filter(
+                PollJob.target == self.target,
+                PollJob.date == date,
+                unleased
+            ).update(
+                {PollJob.lease_owner: self.worker_id, PollJob.lease_expires_at: lease_until},
+                synchronize_session=False
+            )
+            self.db.commit()
+            
+            if updated:
+                leased_dates.append(date)
+        
+        if not leased_dates:
+            return []
+        
+        return self.db.query(PollJob).filter(
+            PollJob.target == self.target,
+            PollJob.date.in_(leased_dates)
+        ).order_by(PollJob.date).all()
+    
+    def request_immediate_poll(self) -> int:
+        """
+        Make every job due now, so workers pick them up on their next pass
+        
+        Jobs currently leased keep their lease - the worker holding them is
+        already polling those dates.
+        
+        Returns:
+            Number of jobs made due
+        """
+        self.sync_jobs()
+        
+        updated = self.db.query(PollJob).filter(
+            PollJob.target == self.target
+        ).update({PollJob.next_run_at: datetime.now()}, synchronize_session=False)
+        self.db.commit()
+        
+        return updated
+    
+    def heartbeat(self, dates: Iterable[str]) -> int:
+        """
+        Extend our leases on the given dates
+        
+        Returns:
+            Number of leases still held
+        """
+        lease_until = datetime.now() + timedelta(seconds=settings.WORKER_LEASE_SECONDS)
+        
+        updated = self.db.query(PollJob).filter(
+            PollJob.target == self.target,
+            PollJob.date.in_(list(dates)),
+            PollJob.lease_owner == self.worker_id
+        ).update({PollJob.lease_expires_at: lease_until}, synchronize_session=False)
+        self.db.commit()
+        
+        return updated
+    
+    def complete(self, dates: Iterable[str], failed: Iterable[str] = ()):
+        """
+        Release our leases and schedule each job's next run
+        
+        Successful dates run again after POLL_INTERVAL_MINUTES, failed ones
+        after REPOLL_FAILED_DATES_MINUTES.
+        """
+        now = datetime.now()
+        failed = set(failed)
+        
+        for date in dates:
+            job = self.db.query(PollJob).filter(
+                PollJob.target == self.target,
+                PollJob.date == date,
+                PollJob.lease_owner == self.worker_id
+            ).first()
+            
+            if not job:
+                # Lease expired and another worker took over
+                continue
+            
+            if date in failed:
+                job.failures = (job.failures or 0) + 1
+                job.next_run_at = now + timedelta(minutes=settings.REPOLL_FAILED_DATES_MINUTES)
+            else:
+                job.failures = 0
+                job.last_polled = now
+                job.next_run_at = now + timedelta(minutes=settings.POLL_INTERVAL_MINUTES)
+            
+            job.lease_owner = None
+            job.lease_expires_at = None
+        
+        self.db.commit()
@@ -1,10 +1,16 @@
 import asyncio
+import threading
 from datetime import datetime, timedelta
+from typing import List, Optional, Set
 from sqlalchemy.orm import Session
 
+from app.services.app_state import AppStateService
+from app.services.lifecycle import lifecycle
 from app.services.setmore_client import SetmoreClient
 from app.services.slot_tracker import SlotTracker
 from app.services.notification_service import NotificationService  # NEW
+from app.services.subscriber_cache import active_subscribers
+from app.services.tracing import tracer
 from app.models.database import SessionLocal
 from app.config import settings
 
@@ -14,69 +20,200 @@ class PollingService:
     
     def __init__(self):
         self.setmore = SetmoreClient()
+        
+        # Dates ("2026-01-20") whose last fetch failed, awaiting a targeted re-poll.
+        # Shared by scheduler threads and the API loop - only touch under the lock
+        self._failed_dates: Set[str] = set()
+        self._failed_lock = threading.Lock()
+        
+        # Keep snapshots in memory when this process is the only poller
+        self.cache_snapshots = settings.ENABLE_IN_PROCESS_POLLER
     
-    async def poll_for_new_slots(self):
+    async def poll_for_new_slots(self, lane: Optional[str] = None):
         """
         Main polling function - checks for new slots across all days
         This runs every hour automatically
+        
+        Args:
+            lane: Rate governor lane - "adhoc" when triggered by an admin,
+                defaults to the poll client's own lane
         """
         print(f"\n{'='*60}")
         print(f"🔄 Starting poll at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*60}")
         
+        dates = [datetime.now() + timedelta(days=i) for i in range(settings.DAYS_TO_POLL)]
+        new_slots_found = await self.poll_dates(dates, cleanup=True, lane=lane)
+        
+        # A poll cut short by shutdown doesn't count - the next instance catches up
+        if not lifecycle.accepting_work:
+            return new_slots_found
+        
+        # Persist so a restart can tell whether a catch-up poll is needed
+        db = SessionLocal()
+        try:
+            AppStateService(db).set_last_poll_at(datetime.now())
+        finally:
+            db.close()
+        
+        return new_slots_found
+    
+    def failed_dates(self) -> Set[str]:
+        """Copy of the dates waiting for a re-poll"""
+        with self._failed_lock:
+            return set(self._failed_dates)
+    
+    def mark_failed(self, dates):
+        with self._failed_lock:
+            self._failed_dates.update(dates)
+    
+    def clear_failed(self, dates):
+        with self._failed_lock:
+            self._failed_dates.difference_update(dates)
+    
+    def take_failed_dates(self) -> Set[str]:
+        """Remove and return every queued failed date"""
+        with self._failed_lock:
+            taken, self._failed_dates = self._failed_dates, set()
+        return taken
+    
+    async def repoll_failed_dates(self):
+        """
+        Re-poll only the dates that failed in an earlier poll
+        
+        Dates that have since moved into the past are dropped.
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        pending = sorted(d for d in self.take_failed_dates() if d >= today)
+        
+        if not pending:
+            return {}
+        
+        print(f"\n🔁 Re-polling {len(pending)} failed dates: {pending}")
+        dates = [datetime.strptime(d, "%Y-%m-%d") for d in pending]
+        return await self.poll_dates(dates, trace_name="repoll")
+    
+    async def poll_dates(
+        self,
+        dates: List[datetime],
+        cleanup: bool = False,
+        trace_name: str = "poll",
+        lane: Optional[str] = None
+    ):
+        """
+        Fetch, diff, snapshot and notify for the given dates
+        
+        Dates that fail to fetch are queued as failed dates, as are dates
+        left unfetched because shutdown began mid-poll. Each call is traced
+        as one cycle under trace_name.
+        
+        Returns:
+            Dictionary mapping date strings to newly found slots
+        """
+        if not lifecycle.accepting_work:
+            print("⏸️ Shutting down - not starting a new poll")
+            return {}
+        
         db = SessionLocal()
         try:
-            tracker = SlotTracker(db)
-            notifier = NotificationService(db)  # NEW
-            new_slots_found = {}
+            with lifecycle.track(), tracer.cycle(trace_name, dates=len(dates)):
+                return await self._poll_dates(db, dates, cleanup, lane)
+        finally:
+            db.close()
+    
+    async def _poll_dates(
+        self, db: Session, dates: List[datetime], cleanup: bool, lane: Optional[str]
+    ):
+        """Body of poll_dates, run while tracked as in-flight work"""
+        tracker = SlotTracker(db, use_cache=self.cache_snapshots)
+        notifier = NotificationService(db)  # NEW
+        new_slots_found = {}
+        
+        # One consistent subscriber set for the whole cycle
+        with tracer.span("subscribers"):
+            subscribers = active_subscribers.snapshot(db)
+        
+        for index, date in enumerate(dates):
+            date_str = date.strftime("%Y-%m-%d")
             
-            # Poll for next N days
-            for i in range(settings.DAYS_TO_POLL):
-                date = datetime.now() + timedelta(days=i)
-                date_str = date.strftime("%Y-%m-%d")
-                
-                try:
-                    # Fetch current slots from Setmore
-                    current_slots = await self.setmore.get_slots(date)
-                    
-                    # Find new slots
+            if not lifecycle.accepting_work:
+                # Stop fetching - what's left is polled after restart
+                skipped = [d.strftime("%Y-%m-%d") for d in dates[index:]]
+                self.mark_failed(skipped)
+                print(f"⏸️ Shutting down - skipped {len(skipped)} dates")
+                break
+            
+            try:
+                # Fetch current slots from Setmore
+                current_slots = await self.setmore.get_slots(date, lane=lane)
+            except Exception as e:
+                print(f"❌ Error polling {date_str}: {e}")
+                self.mark_failed([date_str])
+                continue
+            
+            self.clear_failed([date_str])
+            
+            try:
+                # Find new slots
+                with tracer.span("db", "find_new_slots"):
                     new_slots = tracker.find_new_slots(date_str, current_slots)
-                    
-                    # Save snapshot
+                
+                # Save snapshot
+                with tracer.span("db", "save_snapshot"):
                     tracker.save_snapshot(date_str, current_slots)
-                    
-                    # If new slots found, notify subscribers
-                    if new_slots:
-                        new_slots_found[date_str] = new_slots
-                        sent_count = notifier.notify_new_slots(date_str, new_slots)  # NEW
-                        print(f"📱 Sent {sent_count} notifications for {date_str}")
-                    
-                except Exception as e:
-                    print(f"❌ Error polling {date_str}: {e}")
-            
+                
+                # Collect new slots - subscribers get one digest per cycle
+                if new_slots:
+                    new_slots_found[date_str] = new_slots
+                
+            except Exception as e:
+                # A failed commit leaves the session unusable until rolled back
+                db.rollback()
+                print(f"❌ Error processing {date_str}: {e}")
+        
+        # Finish anything an earlier instance left unsent at shutdown
+        try:
+            with tracer.span("notify", "resume_pending"):
+                notifier.resume_pending(subscribers)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error resuming pending notifications: {e}")
+        
+        # Notify subscribers about every date at once
+        if new_slots_found:
+            try:
+                with tracer.span("notify", "digest"):
+                    sent_count = notifier.notify_digest(new_slots_found, subscribers)
+                print(f"📱 Sent digest to {sent_count} subscribers covering {len(new_slots_found)} dates")
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Error sending notifications: {e}")
+        
+        if cleanup:
             # Cleanup old snapshots (dates in the past)
             yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            tracker.cleanup_old_snapshots(yesterday)
-            
-            # Summary
-            if new_slots_found:
-                print(f"\n🎉 FOUND NEW SLOTS:")
-                for date, slots in new_slots_found.items():
-                    print(f"   {date}: {slots}")
-            else:
-                print(f"\n✅ No new slots detected")
-            
-            print(f"{'='*60}\n")
-            
-            return new_slots_found
-            
-        finally:
-            db.close()
+            with tracer.span("db", "cleanup"):
+                tracker.cleanup_old_snapshots(yesterday)
+        
+        # Summary
+        if new_slots_found:
+            print(f"\n🎉 FOUND NEW SLOTS:")
+            for date, slots in new_slots_found.items():
+                print(f"   {date}: {slots}")
+        else:
+            print(f"\n✅ No new slots detected")
+        
+        failed = self.failed_dates()
+        if failed:
+            print(f"⏳ Queued for re-poll: {sorted(failed)}")
+        
+        print(f"{'='*60}\n")
+        
+        return new_slots_found
     
     def _get_subscriber_count(self, db: Session) -> int:
         """Get count of active subscribers"""
-        from app.models.models import Subscription
-        return db.query(Subscription).filter(Subscription.is_active == True).count()
+        return active_subscribers.count(db)
 
 
 # Global instance
@@ -88,4 +225,24 @@ def run_poll_sync():
     Synchronous wrapper for the async poll function
     APScheduler needs a sync function, so we use asyncio.run()
     """
-    asyncio.run(polling_service.poll_for_new_slots())
\ No newline at end of file
+    asyncio.run(polling_service.poll_for_new_slots())
+
+
+def run_repoll_sync():
+    """Synchronous wrapper for re-polling failed dates"""
+    asyncio.run(polling_service.repoll_failed_dates())
+
+
+def run_resume_pending_sync():
+    """Send anything a previous instance persisted at shutdown (run at startup)"""
+    if not lifecycle.accepting_work:
+        return
+    
+    db = SessionLocal()
+    try:
+        with lifecycle.track():
+            NotificationService(db).resume_pending()
+    except Exception as e:
+        print(f"❌ Error resuming pending notifications: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from app.config import settings
+
+
+# Priority lanes, highest first
+LANES = ("poll", "adhoc")
+
+
+class RateGovernor:
+    """
+    Process-wide token bucket for Setmore requests
+    
+    Thread-safe, since polls run in their own event loop on scheduler
+    threads while ad-hoc endpoints run on the API loop.
+    
+    - "poll" (scheduled polls) may use the whole bucket
+    - "adhoc" (admin/test endpoints) must leave a reserve for polls and
+      yields while a poll is waiting
+    
+    On a 429 the rate is cut (multiplicative decrease) and the bucket is
+    paused for Retry-After. Every success nudges the rate back up towards
+    the configured ceiling (additive increase).
+    """
+    
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float,
+        adhoc_reserve: float,
+        decrease_factor: float,
+        increase_step: float
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        
+        # Ad-hoc calls need 1 + reserve tokens and the bucket never holds more
+        # than burst - a larger reserve would starve them forever
+        self.adhoc_reserve = min(adhoc_reserve * burst, max(0.0, burst - 1.0))
+        if self.adhoc_reserve < adhoc_reserve * burst:
+            print(
+                f"⚠️ Ad-hoc reserve {adhoc_reserve:.0%} of a {burst} token burst leaves "
+                f"no room for ad-hoc calls - clamped to {self.adhoc_reserve:.1f} tokens"
+            )
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        
+        self._waiting: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._stats = {
+            lane: {"requests": 0, "waited": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for lane in LANES
+        }
+        self._throttled = 0
+    
+    def _refill(self, now: float):
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = max(now, self._updated)
+    
+    def _try_take(self, lane: str, now: float) -> float:
+        """Take a token if allowed; otherwise return seconds to wait"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        
+        self._refill(now)
+        
+        needed = 1.0
+        if lane != "poll":
+            if self._waiting["poll"]:
+                return 1.0 / self.rate
+            needed += self.adhoc_reserve
+        
+        if self._tokens >= needed:
+            self._tokens -= 1.0
+            return 0.0
+        
+        return (needed - self._tokens) / self.rate
+    
+    async def acquire(self, lane: str = "poll") -> float:
+        """
+        Wait for permission to send one request
+        
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        registered = False
+        
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_take(lane, time.monotonic())
+                    if wait <= 0:
+                        waited = time.monotonic() - started if registered else 0.0
+                        stats = self._stats[lane]
+                        stats["requests"] += 1
+                        stats["total_wait"] += waited
+                        stats["max_wait"] = max(stats["max_wait"], waited)
+                        if registered:
+                            stats["waited"] += 1
+                        return waited
+                    
+                    if not registered:
+                        self._waiting[lane] += 1
+                        registered = True
+                
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            if registered:
+                with self._lock:
+                    self._waiting[lane] -= 1
+    
+    def record_success(self):
+        """Additive increase back towards the configured rate"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+    
+    def record_throttled(self, retry_after: Optional[float] = None):
+        """Setmore said 429 - slow down and honour Retry-After"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+        
+        print(f"🐢 Setmore throttled us - rate lowered to {self.rate:.2f}/s")
+    
+    def stats(self) -> dict:
+        """Live budget and wait times"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            return {
+                "rate_per_second": round(self.rate, 3),
+                "max_rate_per_second": self.max_rate,
+                "min_rate_per_second": self.min_rate,
+                "burst": self.burst,
+                "tokens_available": round(self._tokens, 2),
+                "paused_for_seconds": round(max(0.0, self._paused_until - now), 2),
+                "throttled_responses": self._throttled,
+                "lanes": {
+                    lane: {
+                        "requests": s["requests"],
+                        "waiting_now": self._waiting[lane],
+                        "requests_that_waited": s["waited"],
+                        "avg_wait_seconds": round(s["total_wait"] / s["requests"], 3) if s["requests"] else 0.0,
+                        "max_wait_seconds": round(s["max_wait"], 3),
+                    }
+                    for lane, s in self._stats.items()
+                }
+            }
+
+
+# Global instance - every Setmore request in this process goes through it
+setmore_governor = RateGovernor(
+    rate=settings.SETMORE_RATE_LIMIT_PER_SECOND,
+    burst=settings.SETMORE_RATE_BURST,
+    min_rate=settings.SETMORE_RATE_MIN_PER_SECOND,
+    adhoc_reserve=settings.SETMORE_ADHOC_RESERVE,
+    decrease_factor=settings.SETMORE_RATE_DECREASE_FACTOR,
+    increase_step=settings.SETMORE_RATE_INCREASE_STEP
+)
@@ -0,0 +1,295 @@
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import gzip
+import json
+import os
+import time
+
+from app.config import settings
+from app.models.database import SessionLocal
+from app.services.app_state import AppStateService
+from app.models.models import (
+    Delivery, NotificationDailyStat, NotificationEvent, NotificationLog, NotificationRecipient
+)
+
+
+class RetentionService:
+    """Rolls old notification records into daily aggregates and deletes them"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def run(self, retention_days: Optional[int] = None) -> int:
+        """
+        Compact, archive and delete notification logs older than the retention window
+        
+        Rows are processed in batches of RETENTION_BATCH_SIZE, each in its
+        own short transaction with a pause in between, so live writes
+        aren't blocked for long.
+        
+        Args:
+            retention_days: Override NOTIFICATION_LOG_RETENTION_DAYS
+            
+        Returns:
+            Number of log rows removed
+        """
+        if retention_days is None:
+            retention_days = settings.NOTIFICATION_LOG_RETENTION_DAYS
+        
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        archive_path = self._archive_path()
+        
+        removed = self._compact_recipients(cutoff, archive_path)
+        removed += self._compact_legacy_logs(cutoff, archive_path)
+        removed_events = self._purge_orphan_events(cutoff)
+        removed_deliveries = self._purge_past_deliveries()
+        
+        if removed > 0:
+            print(f"🧹 Compacted {removed} notification records older than {cutoff.strftime('%Y-%m-%d')}")
+            if archive_path:
+                print(f"📦 Archived to {archive_path}")
+        
+        if removed > 0 or removed_events > 0 or removed_deliveries > 0:
+            self._incremental_vacuum()
+        
+        return removed
+    
+    def _compact_recipients(self, cutoff: datetime, archive_path: Optional[str]) -> int:
+        """Archive, roll up and delete notification_recipients rows older than cutoff"""
+        removed = 0
+        
+        while True:
+            batch = self.db.query(NotificationRecipient, NotificationEvent).join(
+                NotificationEvent, NotificationRecipient.event_id == NotificationEvent.id
+            ).filter(
+                NotificationRecipient.sent_at < cutoff
+            ).order_by(NotificationRecipient.sent_at).limit(settings.RETENTION_BATCH_SIZE).all()
+            
+            if not batch:
+                break
+            
+            # Archive first - if that fails nothing is deleted
+            if archive_path:
+                self._archive(archive_path, [
+                    {
+                        "id": recipient.id,
+                        "event_id": event.id,
+                        "phone_number": recipient.phone_number,
+                        "date": event.date,
+                        "slots": event.get_slots_list(),
+                        "status": recipient.status,
+                        "provider_sid": recipient.provider_sid,
+                        "sent_at": recipient.sent_at.isoformat()
+                    }
+                    for recipient, event in batch
+                ])
+            
+            self._roll_up([
+                (recipient.sent_at, event.date, len(event.get_slots_list()))
+                for recipient, event in batch
+                if recipient.status == "sent"
+            ])
+            
+            self.db.query(NotificationRecipient).filter(
+                NotificationRecipient.id.in_([recipient.id for recipient, _ in batch])
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            
+            removed += len(batch)
+            
+            if len(batch) < settings.RETENTION_BATCH_SIZE:
+                break
+            time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+        
+        return removed
+    
+    def _compact_legacy_logs(self, cutoff: datetime, archive_path: Optional[str]) -> int:
+        """Archive, roll up and delete legacy notification_logs rows older than cutoff"""
+        removed = 0
+        
+        while True:
+            batch = self.db.query(NotificationLog).filter(
+                NotificationLog.sent_at < cutoff
+            ).order_by(NotificationLog.sent_at).limit(settings.RETENTION_BATCH_SIZE).all()
+            
+            if not batch:
+                break
+            
+            # Archive first - if that fails nothing is deleted
+            if archive_path:
+                self._archive(archive_path, [
+                    {
+                        "id": log.id,
+                        "phone_number": log.phone_number,
+                        "date": log.date,
+                        "slots": log.get_slots_list(),
+                        "sent_at": log.sent_at.isoformat()
+                    }
+                    for log in batch
+                ])
+            
+            self._roll_up([
+                (log.sent_at, log.date, len(log.get_slots_list())) for log in batch
+            ])
+            
+            self.db.query(NotificationLog).filter(
+                NotificationLog.id.in_([log.id for log in batch])
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            
+            removed += len(batch)
+            
+            if len(batch) < settings.RETENTION_BATCH_SIZE:
+                break
+            time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+        
+        return removed
+    
+    def _purge_orphan_events(self, cutoff: datetime) -> int:
+        """
+        Delete notification events older than cutoff that no recipient points to
+        
+        Returns:
+            Number of events removed
+        """
+        has_recipients = self.db.query(NotificationRecipient.id).filter(
+            NotificationRecipient.event_id == NotificationEvent.id
+        ).exists()
+        
+        removed = self.db.query(NotificationEvent).filter(
+            NotificationEvent.created_at < cutoff,
+            ~has_recipients
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        
+        return removed
+    
+    def _purge_past_deliveries(self) -> int:
+        """
+        Delete dedupe rows for dates that have passed (nothing left to re-send)
+        
+        One date can hold subscribers x slots rows, so these go in batches of
+        RETENTION_BATCH_SIZE like the other compaction loops.
+        
+        Returns:
+            Number of delivery rows removed
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        removed = 0
+        
+        while True:
+            # Pick the batch in a subquery - no bound parameter per row
+            batch = self.db.query(Delivery.phone_number, Delivery.date, Delivery.slot).filter(
+                Delivery.date < today
+            ).limit(settings.RETENTION_BATCH_SIZE).subquery()
+            
+            deleted = self.db.query(Delivery).filter(
+                tuple_(Delivery.phone_number, Delivery.date, Delivery.slot).in_(
+                    select(batch.c.phone_number, batch.c.date, batch.c.slot)
+                )
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            
+            removed += deleted
+            
+            if deleted < settings.RETENTION_BATCH_SIZE:
+                break
+            time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+        
+        if removed > 0:
+            print(f"🧹 Removed {removed} delivery records for past dates")
+        
+        return removed
+    
+    def _roll_up(self, rows: List[Tuple[datetime, str, int]]):
+        """
+        Add (sent_at, date, slot count) rows to the daily aggregates
+        (same transaction as the delete)
+        """
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        
+        for sent_at, date, slot_count in rows:
+            key = (sent_at.strftime("%Y-%m-%d"), date)
+            counts = totals.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += slot_count
+        
+        for (sent_day, date), (notifications, slots) in totals.items():
+            stat = self.db.query(NotificationDailyStat).filter(
+                NotificationDailyStat.sent_day == sent_day,
+                NotificationDailyStat.date == date
+            ).first()
+            
+            if stat:
+                stat.notification_count += notifications
+                stat.slot_count += slots
+            else:
+                self.db.add(NotificationDailyStat(
+                    sent_day=sent_day,
+                    date=date,
+                    notification_count=notifications,
+                    slot_count=slots
+                ))
+    
+    def _archive_path(self) -> Optional[str]:
+        """Archive file for this run, or None if archiving is disabled"""
+        if not settings.NOTIFICATION_LOG_ARCHIVE_DIR:
+            return None
+        
+        os.makedirs(settings.NOTIFICATION_LOG_ARCHIVE_DIR, exist_ok=True)
+        filename = f"notification_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        return os.path.join(settings.NOTIFICATION_LOG_ARCHIVE_DIR, filename)
+    
+    def _archive(self, path: str, records: List[dict]):
+        """Append raw rows to a gzipped JSON-lines archive"""
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    
+    def _incremental_vacuum(self):
+        """Give freed pages back to the filesystem (SQLite with auto_vacuum=INCREMENTAL)"""
+        if self.db.get_bind().dialect.name != "sqlite":
+            return
+        
+        connection = self.db.connection()
+        mode = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        
+        if mode != 2:
+            print("ℹ️ SQLite auto_vacuum isn't INCREMENTAL - skipping incremental vacuum")
+            return
+        
+        self.db.commit()
+        
+        # sqlite3's execute() only steps this pragma once (one page freed) -
+        # executescript() runs it to completion
+        raw = self.db.get_bind().raw_connection()
+        try:
+            sqlite = raw.driver_connection
+            before = sqlite.execute("PRAGMA freelist_count").fetchone()[0]
+            sqlite.executescript(f"PRAGMA incremental_vacuum({settings.RETENTION_VACUUM_PAGES});")
+            after = sqlite.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            raw.close()
+        
+        if before > after:
+            print(f"🗜️ Incremental vacuum freed {before - after} pages ({after} still free)")
+
+
+def run_retention_sync():
+    """Run the retention job with its own session (for the scheduler)"""
+    db = SessionLocal()
+    try:
+        RetentionService(db).run()
+        
+        # Persist so restarts don't push the next run back a full interval
+        AppStateService(db).set_last_retention_at(datetime.now())
+    except Exception as e:
+        print(f"❌ Notification log retention failed: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_retention_sync()
@@ -1,7 +1,11 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+from datetime import datetime, timedelta
 from app.config import settings
-from app.services.polling_service import run_poll_sync
+from app.models.database import SessionLocal
+from app.services.app_state import AppStateService
+from app.services.polling_service import (
+    polling_service, run_poll_sync, run_repoll_sync, run_resume_pending_sync
+)
+from app.services.retention_service import run_retention_sync
 import logging
 
 # Setup logging for APScheduler
@@ -12,37 +16,161 @@ class Scheduler:
     """Manages background job scheduling"""
     
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
+        # APScheduler is imported and built on start() to keep app import fast
+        self.scheduler = None
         self.is_running = False
     
-    def start(self):
-        """Start the scheduler"""
+    def start(self, poll: bool = True):
+        """
+        Start the scheduler
+        
+        Args:
+            poll: Also schedule Setmore polling (off when standalone workers poll)
+        """
         if self.is_running:
             print("⚠️ Scheduler already running")
             return
         
-        # Add polling job
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.interval import IntervalTrigger
+        
+        if self.scheduler is None:
+            self.scheduler = BackgroundScheduler()
+        
+        if poll:
+            # Add polling job - picks up from the last persisted poll
+            self.scheduler.add_job(
+                func=self._run_poll_job,
+                trigger=IntervalTrigger(minutes=settings.POLL_INTERVAL_MINUTES),
+                id='poll_setmore',
+                name='Poll Setmore for new slots',
+                replace_existing=True,
+                next_run_time=self._first_poll_time()
+            )
+            
+            # Pick up sends the previous instance couldn't finish
+            self.scheduler.add_job(
+                func=run_resume_pending_sync,
+                id='resume_pending',
+                name='Resume pending notifications',
+                replace_existing=True
+            )
+        
+        # Add notification log retention job
         self.scheduler.add_job(
-            func=run_poll_sync,
-            trigger=IntervalTrigger(minutes=settings.POLL_INTERVAL_MINUTES),
-            id='poll_setmore',
-            name='Poll Setmore for new slots',
-            replace_existing=True
+            func=run_retention_sync,
+            trigger=IntervalTrigger(hours=settings.RETENTION_INTERVAL_HOURS),
+            id='notification_log_retention',
+            name='Compact old notification logs',
+            replace_existing=True,
+            next_run_time=self._first_retention_time()
         )
         
         self.scheduler.start()
         self.is_running = True
         
-        print(f"✅ Scheduler started - polling every {settings.POLL_INTERVAL_MINUTES} minutes")
-        print(f"📅 Monitoring next {settings.DAYS_TO_POLL} days")
+        if poll:
+            print(f"✅ Scheduler started - polling every {settings.POLL_INTERVAL_MINUTES} minutes")
+            print(f"📅 Monitoring next {settings.DAYS_TO_POLL} days")
+        else:
+            print("✅ Scheduler started - polling left to standalone workers")
+        print(f"🧹 Keeping notification logs for {settings.NOTIFICATION_LOG_RETENTION_DAYS} days")
     
     def stop(self):
-        """Stop the scheduler"""
+        """
+        Stop the scheduler
+        
+        Doesn't wait for a running poll - lifecycle.wait_idle() does that
+        with a deadline.
+        """
         if self.is_running:
-            self.scheduler.shutdown()
+            self.scheduler.shutdown(wait=False)
             self.is_running = False
             print("🛑 Scheduler stopped")
     
+    def _first_poll_time(self) -> datetime:
+        """
+        When the first poll after startup should run
+        
+        Right away if the last persisted poll is overdue (or there isn't one),
+        otherwise one interval after it - so restarts don't reset the clock.
+        """
+        db = SessionLocal()
+        try:
+            last_poll_at = AppStateService(db).get_last_poll_at()
+        except Exception as e:
+            print(f"⚠️ Couldn't read last poll time: {e}")
+            last_poll_at = None
+        finally:
+            db.close()
+        
+        now = datetime.now()
+        
+        if last_poll_at is None:
+            print("⚡ No previous poll recorded - catch-up poll now")
+            return now
+        
+        next_poll = last_poll_at + timedelta(minutes=settings.POLL_INTERVAL_MINUTES)
+        if next_poll <= now:
+            print(f"⚡ Last poll was at {last_poll_at.strftime('%Y-%m-%d %H:%M:%S')} - catch-up poll now")
+            return now
+        
+        print(f"⏭️ Last poll was at {last_poll_at.strftime('%Y-%m-%d %H:%M:%S')} - "
+              f"next poll at {next_poll.strftime('%H:%M:%S')}")
+        return next_poll
+    
+    def _first_retention_time(self) -> datetime:
+        """
+        When the retention job should first run after startup
+        
+        One interval after the last persisted run, or shortly after boot if
+        that's overdue - so short-lived instances still get to run it.
+        """
+        db = SessionLocal()
+        try:
+            last_run_at = AppStateService(db).get_last_retention_at()
+        except Exception as e:
+            print(f"⚠️ Couldn't read last retention run: {e}")
+            last_run_at = None
+        finally:
+            db.close()
+        
+        # Let warm start and the catch-up poll go first
+        soonest = datetime.now() + timedelta(minutes=settings.RETENTION_STARTUP_DELAY_MINUTES)
+        
+        if last_run_at is None:
+            return soonest
+        return max(soonest, last_run_at + timedelta(hours=settings.RETENTION_INTERVAL_HOURS))
+    
+    def _run_poll_job(self):
+        """Scheduled full poll, followed by a re-poll if any dates failed"""
+        run_poll_sync()
+        self.schedule_repoll()
+    
+    def _run_repoll_job(self):
+        """Re-poll failed dates, re-queueing any that fail again"""
+        run_repoll_sync()
+        self.schedule_repoll()
+    
+    def schedule_repoll(self):
+        """Schedule a targeted re-poll of failed dates (if any)"""
+        failed = polling_service.failed_dates()
+        if not self.is_running or not failed:
+            return
+        
+        from apscheduler.triggers.date import DateTrigger
+        
+        run_at = datetime.now() + timedelta(minutes=settings.REPOLL_FAILED_DATES_MINUTES)
+        self.scheduler.add_job(
+            func=self._run_repoll_job,
+            trigger=DateTrigger(run_date=run_at),
+            id='repoll_failed_dates',
+            name='Re-poll failed dates',
+            replace_existing=True
+        )
+        print(f"⏳ Re-poll of {len(failed)} failed dates scheduled in "
+              f"{settings.REPOLL_FAILED_DATES_MINUTES} minutes")
+    
     def run_now(self):
         """Trigger a poll immediately (for testing)"""
         print("🚀 Triggering manual poll...")
@@ -50,6 +178,8 @@ class Scheduler:
     
     def get_jobs(self):
         """Get list of scheduled jobs"""
+        if self.scheduler is None:
+            return []
         return self.scheduler.get_jobs()
 
 
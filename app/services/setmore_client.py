@@ -1,10 +1,105 @@
-import httpx
-from datetime import datetime, timedelta
-from typing import List, Optional
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, List, Optional
 from app.config import settings
+from app.services.lifecycle import lifecycle
+from app.services.rate_governor import setmore_governor
+from app.services.tracing import tracer
+
+if TYPE_CHECKING:
+    import httpx
+
+
+# Status codes worth retrying - everything else fails immediately
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when Setmore calls are short-circuited during an outage"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling Setmore after repeated failures
+    
+    closed    -> requests flow normally
+    open      -> requests fail fast until reset_seconds have passed
+    half-open -> a single trial request decides whether to close or re-open
+    
+    Thread-safe - one client is shared by scheduler threads and the API loop.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: int):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failure_count = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+    
+    def before_request(self) -> bool:
+        """
+        Raise CircuitOpenError if the request should not be attempted
+        
+        Returns:
+            True if this request is the half-open trial - the caller must
+            call end_trial() when it finishes, however it finishes
+        """
+        with self._lock:
+            state = self.state
+            if state == "open":
+                raise CircuitOpenError("Setmore circuit breaker is open")
+            if state == "half-open":
+                if self._trial_in_flight:
+                    raise CircuitOpenError("Setmore circuit breaker is half-open, trial in progress")
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def end_trial(self):
+        """Let another trial through if this one ended without a verdict"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("✅ Setmore circuit breaker closed")
+            self.failure_count = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failure_count += 1
+            self._trial_in_flight = False
+            
+            if self.opened_at is not None or self.failure_count >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                print(f"🔌 Setmore circuit breaker open for {self.reset_seconds}s "
+                      f"after {self.failure_count} failures")
+
 
 class SetmoreClient:
-    def __init__(self):
+    def __init__(self, lane: str = "poll"):
+        """
+        Args:
+            lane: Default rate governor priority lane - "poll" for scheduled
+                polling, "adhoc" for admin/test endpoints. Calls can override it.
+        """
+        self.lane = lane
         self.base_url = settings.SETMORE_BASE_URL
         self.refresh_token = settings.SETMORE_REFRESH_TOKEN
         self.staff_key = settings.SETMORE_STAFF_KEY
@@ -13,43 +108,157 @@ class SetmoreClient:
         # Token management
         self._access_token: Optional[str] = None
         self._token_expiry: Optional[datetime] = None
+        
+        # Retry / outage handling
+        self.max_retries = settings.SETMORE_MAX_RETRIES
+        self.backoff_base = settings.SETMORE_BACKOFF_BASE_SECONDS
+        self.backoff_max = settings.SETMORE_BACKOFF_MAX_SECONDS
+        self.circuit = CircuitBreaker(
+            settings.SETMORE_CIRCUIT_FAILURE_THRESHOLD,
+            settings.SETMORE_CIRCUIT_RESET_SECONDS
+        )
     
-    async def _ensure_valid_token(self):
+    async def _request(
+        self, method: str, url: str, lane: Optional[str] = None, **kwargs
+    ) -> "httpx.Response":
+        """
+        Send a request to Setmore with retries and circuit breaking
+        
+        Every attempt waits for the shared rate governor first, in the given
+        lane (the client's own lane if None). Timeouts,
+        connection errors, 429 and 5xx responses are retried with jittered
+        exponential backoff (honouring Retry-After when present).
+        
+        Raises:
+            CircuitOpenError: if the circuit breaker is open
+            httpx.HTTPError: if the request still fails after all retries
+        """
+        import httpx  # Deferred so importing the app doesn't pay for httpx
+        
+        is_trial = self.circuit.before_request()
+        try:
+            return await self._request_with_retries(httpx, method, url, lane or self.lane, **kwargs)
+        finally:
+            # Cancellation or an unexpected error mustn't leave the breaker stuck half-open
+            if is_trial:
+                self.circuit.end_trial()
+    
+    async def _request_with_retries(
+        self, httpx, method: str, url: str, lane: str, **kwargs
+    ) -> "httpx.Response":
+        """Retry loop for _request"""
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                # Every attempt spends a token from the process-wide budget
+                with tracer.span("rate_wait"):
+                    await setmore_governor.acquire(lane)
+                
+                with tracer.span("http", f"{method} {url.rsplit('/', 1)[-1]}"):
+                    async with httpx.AsyncClient() as client:
+                        response = await client.request(method, url, **kwargs)
+                
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    self.circuit.record_success()
+                    setmore_governor.record_success()
+                    return response
+                
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    setmore_governor.record_throttled(retry_after)
+                error = httpx.HTTPStatusError(
+                    f"Setmore returned {response.status_code}",
+                    request=response.request,
+                    response=response
+                )
+            except httpx.HTTPStatusError:
+                # Non-retryable status (4xx) - Setmore is up, the request is bad
+                self.circuit.record_success()
+                raise
+            except httpx.TransportError as e:
+                error = e
+            
+            # No retries once shutdown has started - the next instance will re-poll
+            if attempt >= self.max_retries or not lifecycle.accepting_work:
+                self.circuit.record_failure()
+                raise error
+            
+            delay = self._backoff_delay(attempt, retry_after)
+            attempt += 1
+            print(f"🔁 Setmore {method} failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """
+        Full-jitter exponential backoff, never shorter than Retry-After
+        
+        Retry-After is honoured in full, even past backoff_max - retrying
+        sooner only spends a retry on a request the server will refuse.
+        """
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+    
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given as seconds or an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
+    async def prefetch_token(self):
+        """Fetch an access token ahead of the first request (warm start)"""
+        await self._ensure_valid_token()
+    
+    async def _ensure_valid_token(self, lane: Optional[str] = None):
         """Refresh access token if expired or not set"""
         if self._access_token is None or datetime.now() >= self._token_expiry:
-            await self._refresh_access_token()
+            with tracer.span("token_refresh"):
+                await self._refresh_access_token(lane)
     
-    async def _refresh_access_token(self):
+    async def _refresh_access_token(self, lane: Optional[str] = None):
         """Get new access token using refresh token"""
         url = f"{self.base_url}/o/oauth2/token"
         params = {"refreshToken": self.refresh_token}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            
+        response = await self._request("GET", url, lane=lane, params=params)
+        
+        with tracer.span("json_decode"):
             data = response.json()
-            token_info = data["data"]["token"]
-            
-            self._access_token = token_info["access_token"]
-            expires_in = token_info["expires_in"]
-            
-            # Set expiry with 60 second buffer
-            self._token_expiry = datetime.now() + timedelta(seconds=expires_in - 60)
-            
-            print(f"✅ Token refreshed. Expires in {expires_in} seconds")
+        token_info = data["data"]["token"]
+        
+        self._access_token = token_info["access_token"]
+        expires_in = token_info["expires_in"]
+        
+        # Set expiry with 60 second buffer
+        self._token_expiry = datetime.now() + timedelta(seconds=expires_in - 60)
+        
+        print(f"✅ Token refreshed. Expires in {expires_in} seconds")
     
-    async def get_slots(self, date: datetime) -> List[str]:
+    async def get_slots(self, date: datetime, lane: Optional[str] = None) -> List[str]:
         """
         Fetch available time slots for a specific date
         
         Args:
             date: The date to fetch slots for
+            lane: Rate governor lane for this call - defaults to the client's lane
             
         Returns:
             List of time slot strings like ["1:00 PM", "2:20 PM"]
         """
-        await self._ensure_valid_token()
+        await self._ensure_valid_token(lane)
         
         # Format date as DD/MM/YYYY
         date_str = date.strftime("%d/%m/%Y")
@@ -69,14 +278,13 @@ class SetmoreClient:
             "slot_limit": 40
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
+        response = await self._request("POST", url, lane=lane, json=payload, headers=headers)
+        
+        with tracer.span("json_decode"):
             data = response.json()
-            slots = data["data"]["slots"]
-            
-            return slots
+        slots = data["data"]["slots"]
+        
+        return slots
     
     async def get_slots_for_date_range(self, days: int = 7) -> dict:
         """
@@ -103,4 +311,4 @@ class SetmoreClient:
                 print(f"❌ Error fetching slots for {date_key}: {e}")
                 results[date_key] = []
         
-        return results
\ No newline at end of file
+        return results
@@ -1,13 +1,42 @@
 from sqlalchemy.orm import Session
-from app.models.models import SlotSnapshot
-from typing import List, Set
+from app.models.models import Delivery, PendingDelivery, SlotSnapshot
+from typing import Dict, Iterable, List, Optional, Set
 from datetime import datetime
+import threading
+
+# Process-wide copy of snapshots for trackers created with use_cache=True.
+# Only safe while this process is the sole writer (the in-process poller) -
+# standalone workers share dates between processes and must read the DB.
+_snapshot_cache: Dict[str, List[str]] = {}
+_snapshot_cache_lock = threading.Lock()
+
 
 class SlotTracker:
     """Manages slot snapshots and detects new slots"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, use_cache: bool = False):
         self.db = db
+        self.use_cache = use_cache
+    
+    def preload(self, dates: Optional[Iterable[str]] = None) -> int:
+        """
+        Load snapshots into the process-wide cache in a single query
+        
+        Args:
+            dates: Date strings to load, or None for every stored snapshot
+            
+        Returns:
+            Number of snapshots loaded
+        """
+        query = self.db.query(SlotSnapshot)
+        if dates is not None:
+            query = query.filter(SlotSnapshot.date.in_(list(dates)))
+        
+        snapshots = {snapshot.date: snapshot.get_slots_list() for snapshot in query}
+        with _snapshot_cache_lock:
+            _snapshot_cache.update(snapshots)
+        
+        return len(snapshots)
     
     def get_last_snapshot(self, date: str) -> List[str]:
         """
@@ -19,10 +48,19 @@ class SlotTracker:
         Returns:
             List of slots, or empty list if no snapshot exists
         """
+        if self.use_cache:
+            with _snapshot_cache_lock:
+                if date in _snapshot_cache:
+                    return list(_snapshot_cache[date])
+        
         snapshot = self.db.query(SlotSnapshot).filter(SlotSnapshot.date == date).first()
-        if snapshot:
-            return snapshot.get_slots_list()
-        return []
+        slots = snapshot.get_slots_list() if snapshot else []
+        
+        if self.use_cache:
+            with _snapshot_cache_lock:
+                _snapshot_cache[date] = list(slots)
+        
+        return slots
     
     def save_snapshot(self, date: str, slots: List[str]):
         """
@@ -35,6 +73,11 @@ class SlotTracker:
         snapshot = self.db.query(SlotSnapshot).filter(SlotSnapshot.date == date).first()
         
         if snapshot:
+            # Slots that got booked - if they open up again that's a new opening
+            gone = set(snapshot.get_slots_list()) - set(slots)
+            if gone:
+                self._forget_deliveries(date, gone)
+            
             # Update existing
             snapshot.set_slots_list(slots)
         else:
@@ -43,9 +86,32 @@ class SlotTracker:
             snapshot.set_slots_list(slots)
             self.db.add(snapshot)
         
+        # Commits the snapshot and the forgotten deliveries together
         self.db.commit()
+        
+        # Every writer in this process keeps the cache current
+        with _snapshot_cache_lock:
+            _snapshot_cache[date] = list(slots)
+        
         print(f"💾 Saved snapshot for {date}: {len(slots)} slots")
     
+    def _forget_deliveries(self, date: str, slots: Set[str]):
+        """
+        Clear dedupe (and unsent pending) rows for slots that disappeared
+        
+        Deliveries dedupe one opening of a slot, not the slot for the whole
+        day - so a cancellation after a booking gets announced again.
+        """
+        self.db.query(Delivery).filter(
+            Delivery.date == date,
+            Delivery.slot.in_(list(slots))
+        ).delete(synchronize_session=False)
+        
+        self.db.query(PendingDelivery).filter(
+            PendingDelivery.date == date,
+            PendingDelivery.slot.in_(list(slots))
+        ).delete(synchronize_session=False)
+    
     def find_new_slots(self, date: str, current_slots: List[str]) -> List[str]:
         """
         Compare current slots with last snapshot to find new ones
@@ -81,5 +147,9 @@ class SlotTracker:
         deleted = self.db.query(SlotSnapshot).filter(SlotSnapshot.date < cutoff_date).delete()
         self.db.commit()
         
+        with _snapshot_cache_lock:
+            for date in [d for d in _snapshot_cache if d < cutoff_date]:
+                del _snapshot_cache[date]
+        
         if deleted > 0:
             print(f"🧹 Cleaned up {deleted} old snapshots")
\ No newline at end of file
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import FrozenSet, Set
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.models import Subscription
+
+
+class ActiveSubscribers:
+    """
+    In-memory set of active subscriber phone numbers
+    
+    Loaded once from the database, then kept current by SubscriptionService
+    as people subscribe and unsubscribe. It is also fully reloaded when older
+    than SUBSCRIBER_CACHE_REFRESH_SECONDS, which picks up changes made by
+    other processes (e.g. standalone workers vs the API).
+    
+    Only a process that handles every subscribe/unsubscribe (the single API
+    process running the in-process poller) can trust the in-memory set.
+    Anywhere else snapshot() reloads from the database, so a number that
+    just unsubscribed is never sent to.
+    """
+    
+    def __init__(self):
+        self._phone_numbers: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        
+        # Same condition as PollingService.cache_snapshots
+        self.sees_all_writes = settings.ENABLE_IN_PROCESS_POLLER
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+    
+    def load(self, db: Session):
+        """(Re)load the full active set from the database"""
+        with self._lock:
+            rows = db.query(Subscription.phone_number).filter(
+                Subscription.is_active == True
+            ).all()
+            self._phone_numbers = {row.phone_number for row in rows}
+            self._loaded_at = time.monotonic()
+        
+        print(f"👥 Loaded {len(self._phone_numbers)} active subscribers")
+    
+    def ensure_loaded(self, db: Session):
+        """Load if never loaded or stale"""
+        if (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= settings.SUBSCRIBER_CACHE_REFRESH_SECONDS
+        ):
+            self.load(db)
+    
+    def add(self, phone_number: str):
+        with self._lock:
+            self._phone_numbers.add(phone_number)
+    
+    def remove(self, phone_number: str):
+        with self._lock:
+            self._phone_numbers.discard(phone_number)
+    
+    def snapshot(self, db: Session) -> FrozenSet[str]:
+        """Consistent copy of the active set - use one per poll cycle"""
+        if self.sees_all_writes:
+            self.ensure_loaded(db)
+        else:
+            self.load(db)
+        with self._lock:
+            return frozenset(self._phone_numbers)
+    
+    def count(self, db: Session) -> int:
+        """Number of active subscribers (no DB round-trip once loaded)"""
+        self.ensure_loaded(db)
+        return len(self._phone_numbers)
+
+
+# Global instance
+active_subscribers = ActiveSubscribers()
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from app.models.models import Subscription
+from app.services.subscriber_cache import active_subscribers
 from datetime import datetime
 from typing import List, Optional
 
@@ -31,6 +32,7 @@ class SubscriptionService:
                 existing.is_active = True
                 existing.subscribed_at = datetime.now()
                 self.db.commit()
+                active_subscribers.add(phone_number)
                 print(f"♻️ Reactivated subscription for {phone_number}")
             else:
                 print(f"ℹ️ {phone_number} already subscribed")
@@ -46,6 +48,7 @@ class SubscriptionService:
         self.db.add(subscription)
         self.db.commit()
         self.db.refresh(subscription)
+        active_subscribers.add(phone_number)
         
         print(f"✅ New subscription: {phone_number}")
         return subscription
@@ -70,6 +73,7 @@ class SubscriptionService:
         
         subscription.is_active = False
         self.db.commit()
+        active_subscribers.remove(phone_number)
         
         print(f"🛑 Unsubscribed: {phone_number}")
         return True
@@ -92,7 +96,5 @@ class SubscriptionService:
         ).first()
     
     def get_subscriber_count(self) -> int:
-        """Get count of active subscribers"""
-        return self.db.query(Subscription).filter(
-            Subscription.is_active == True
-        ).count()
\ No newline at end of file
+        """Get count of active subscribers (from the in-memory set)"""
+        return active_subscribers.count(self.db)
\ No newline at end of file
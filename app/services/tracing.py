@@ -0,0 +1,170 @@
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+
+# Profiling slows a cycle down - never queue more than this many
+MAX_PROFILE_CYCLES = 10
+
+
+class PollTrace:
+    """Timings for one poll cycle, broken down by phase"""
+    
+    def __init__(self, name: str, **attrs):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.spans: List[dict] = []
+        self.dropped_spans = 0
+        self.totals: Dict[str, List[float]] = {}  # phase -> [seconds, count]
+        self.profile: Optional[str] = None
+        self.error: Optional[str] = None
+    
+    def add_span(self, phase: str, label: Optional[str], start: float, end: float):
+        total = self.totals.setdefault(phase, [0.0, 0])
+        total[0] += end - start
+        total[1] += 1
+        
+        # Totals stay exact; individual spans are capped to bound memory
+        if len(self.spans) < settings.TRACE_MAX_SPANS:
+            self.spans.append({
+                "phase": phase,
+                "label": label,
+                "offset_ms": round((start - self._start) * 1000, 2),
+                "duration_ms": round((end - start) * 1000, 2),
+            })
+        else:
+            self.dropped_spans += 1
+    
+    def summary(self) -> str:
+        """One line: total plus time per phase, slowest first"""
+        phases = sorted(self.totals.items(), key=lambda item: -item[1][0])
+        parts = [f"{phase} {seconds:.2f}s ({count})" for phase, (seconds, count) in phases]
+        return f"{self.name} {self.duration:.2f}s | " + " | ".join(parts)
+    
+    def to_dict(self, include_spans: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "phases": {
+                phase: {"total_ms": round(seconds * 1000, 2), "count": count}
+                for phase, (seconds, count) in self.totals.items()
+            },
+            "error": self.error,
+        }
+        if include_spans:
+            data["spans"] = self.spans
+            data["dropped_spans"] = self.dropped_spans
+        if self.profile:
+            data["profile"] = self.profile
+        return data
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class Tracer:
+    """
+    Lightweight per-phase tracing for poll cycles
+    
+    Phase totals are inclusive - a span nested inside another (e.g. http
+    inside token_refresh) counts towards both phases.
+    """
+    
+    def __init__(self):
+        self._traces = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        self._profile_remaining = 0
+    
+    @contextmanager
+    def cycle(self, name: str, **attrs):
+        """Trace one poll cycle (and cProfile it if a capture was requested)"""
+        trace = PollTrace(name, **attrs)
+        token = _current_trace.set(trace)
+        profiler = self._start_profiler()
+        
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = str(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                trace.profile = self._format_profile(profiler)
+            
+            trace.duration = time.perf_counter() - trace._start
+            _current_trace.reset(token)
+            self._traces.append(trace)
+            print(f"⏱️ {trace.summary()}")
+    
+    @contextmanager
+    def span(self, phase: str, label: Optional[str] = None):
+        """Time a phase of the current cycle - free when nothing is being traced"""
+        trace = _current_trace.get()
+        if trace is None:
+            yield
+            return
+        
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add_span(phase, label, start, time.perf_counter())
+    
+    def recent(self, limit: int = 10, include_spans: bool = True) -> List[dict]:
+        """Most recent cycle traces, newest first"""
+        if limit <= 0:
+            return []
+        traces = list(self._traces)[-limit:]
+        return [trace.to_dict(include_spans) for trace in reversed(traces)]
+    
+    def request_profile(self, cycles: int):
+        """cProfile the next N poll cycles (at most MAX_PROFILE_CYCLES)"""
+        with self._lock:
+            self._profile_remaining = min(max(0, cycles), MAX_PROFILE_CYCLES)
+    
+    @property
+    def profile_remaining(self) -> int:
+        return self._profile_remaining
+    
+    def _start_profiler(self) -> Optional[cProfile.Profile]:
+        with self._lock:
+            if self._profile_remaining <= 0:
+                return None
+            self._profile_remaining -= 1
+        
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler is already running (e.g. an overlapping cycle)
+            print(f"⚠️ Skipping profile capture: {e}")
+            return None
+        return profiler
+    
+    def _format_profile(self, profiler: cProfile.Profile) -> str:
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(settings.PROFILE_TOP_FUNCTIONS)
+        return out.getvalue()
+
+
+# Global instance
+tracer = Tracer()
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models.database import SessionLocal
+from app.services.polling_service import polling_service
+from app.services.slot_tracker import SlotTracker
+from app.services.subscriber_cache import active_subscribers
+
+
+def _load_subscribers():
+    db = SessionLocal()
+    try:
+        active_subscribers.load(db)
+    finally:
+        db.close()
+
+
+def _load_snapshots():
+    db = SessionLocal()
+    try:
+        today = datetime.now()
+        dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(settings.DAYS_TO_POLL)]
+        count = SlotTracker(db).preload(dates)
+        print(f"📸 Preloaded {count} slot snapshots")
+    finally:
+        db.close()
+
+
+async def preload():
+    """
+    Warm every cache before serving: subscribers, slot snapshots and the
+    Setmore access token are loaded in parallel
+    
+    A failure in one step is logged and doesn't block startup - that cache
+    just fills on first use instead.
+    """
+    steps = {
+        "subscribers": asyncio.to_thread(_load_subscribers),
+        "slot snapshots": asyncio.to_thread(_load_snapshots),
+        "Setmore token": polling_service.setmore.prefetch_token(),
+    }
+    
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Preloading {name} failed: {result}")
@@ -0,0 +1,176 @@
+"""
+Standalone polling worker
+
+Run one or more of these alongside the API (with ENABLE_IN_PROCESS_POLLER=false)
+to spread polling over several processes or machines:
+
+    python -m app.worker                 # one worker
+    python -m app.worker --processes 4   # four worker processes
+
+Workers share the poll_jobs table: each one leases a batch of due
+(target, date) jobs, keeps the leases alive with heartbeats while it polls,
+and releases them with the next run time. Leases left behind by a crashed
+worker expire and are taken over by the others.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models.database import SessionLocal
+from app.services.lifecycle import lifecycle
+from app.services.poll_jobs import PollJobService
+from app.services.polling_service import polling_service
+from app.services.slot_tracker import SlotTracker
+from app.services.subscriber_cache import active_subscribers
+
+
+class PollWorker:
+    """Leases poll jobs from the shared table and polls them"""
+    
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.polling = polling_service
+        
+        # Other workers write the same snapshots - always read them from the DB
+        self.polling.cache_snapshots = False
+        
+        # Subscriptions change through the API - reload them every cycle
+        active_subscribers.sees_all_writes = False
+        self._stopping = False
+    
+    def stop(self, *_):
+        """Drain the current batch (within SHUTDOWN_DRAIN_SECONDS), then exit"""
+        if not self._stopping:
+            print(f"🛑 Worker {self.worker_id} stopping after current batch")
+        self._stopping = True
+        lifecycle.begin_shutdown()
+    
+    async def run(self):
+        print(f"🚀 Poll worker {self.worker_id} started")
+        
+        while not self._stopping:
+            try:
+                polled = await self.run_once()
+            except Exception as e:
+                print(f"❌ Worker {self.worker_id} error: {e}")
+                polled = 0
+            
+            if not polled:
+                await self._idle(settings.WORKER_IDLE_SECONDS)
+        
+        print(f"👋 Poll worker {self.worker_id} stopped")
+    
+    async def run_once(self) -> int:
+        """
+        Lease one batch of due jobs and poll it
+        
+        Returns:
+            Number of dates polled
+        """
+        db = SessionLocal()
+        try:
+            jobs = PollJobService(db, self.worker_id)
+            jobs.sync_jobs()
+            
+            leased = [job.date for job in jobs.lease_due_jobs(settings.WORKER_BATCH_SIZE)]
+            if not leased:
+                return 0
+            
+            print(f"📋 Worker {self.worker_id} leased {leased}")
+            
+            # A thread, not a task - Twilio sends and commits block the event loop
+            stop_heartbeat = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat, args=(leased, stop_heartbeat), daemon=True
+            )
+            heartbeat.start()
+            try:
+                dates = [datetime.strptime(d, "%Y-%m-%d") for d in leased]
+                await self.polling.poll_dates(dates, trace_name="worker_batch")
+            finally:
+                stop_heartbeat.set()
+                heartbeat.join()
+            
+            # Failed dates are retried through the jobs table, not in-process
+            failed = self.polling.failed_dates() & set(leased)
+            self.polling.clear_failed(failed)
+            jobs.complete(leased, failed=failed)
+            
+            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+            SlotTracker(db).cleanup_old_snapshots(yesterday)
+            
+            return len(leased)
+        finally:
+            db.close()
+    
+    def _heartbeat(self, dates, stop: threading.Event):
+        """Keep our leases alive while a batch is being polled (runs on its own thread)"""
+        interval = max(1, settings.WORKER_LEASE_SECONDS // 3)
+        
+        while not stop.wait(interval):
+            db = SessionLocal()
+            try:
+                held = PollJobService(db, self.worker_id).heartbeat(dates)
+                if held < len(dates):
+                    print(f"⚠️ Worker {self.worker_id} lost {len(dates) - held} leases")
+            except Exception as e:
+                print(f"❌ Heartbeat failed: {e}")
+            finally:
+                db.close()
+    
+    async def _idle(self, seconds: int):
+        """Sleep between batches, waking early if asked to stop"""
+        for _ in range(seconds):
+            if self._stopping:
+                return
+            await asyncio.sleep(1)
+
+
+def run_worker():
+    """Run a single worker in this process until SIGINT/SIGTERM"""
+    worker = PollWorker()
+    signal.signal(signal.SIGINT, worker.stop)
+    signal.signal(signal.SIGTERM, worker.stop)
+    asyncio.run(worker.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenChair polling worker")
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="Number of worker processes to run (default 1)"
+    )
+    args = parser.parse_args()
+    
+    if args.processes <= 1:
+        run_worker()
+        return
+    
+    processes = [
+        multiprocessing.Process(target=run_worker, name=f"poll-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    
+    # Children get SIGINT from the terminal / SIGTERM forwarded below
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+    
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()